@@ -24,4 +24,39 @@ class Settings(BaseSettings):
     # The summary index is stored locally as it's not part of the vector DB.
     SUMMARY_INDEX_DIR: str = os.path.join(ROOT_DIR, "storage", "summary_index")
 
+    # --- Latency Budget ---
+    # End-to-end deadline for a single chat request; can be overridden per ChatRequest.
+    request_deadline_seconds: float = 30.0
+    # Share of the remaining deadline each stage may use, so later stages still get
+    # time to answer. The writer (or fast-mode answer) gets whatever is left.
+    planner_budget_fraction: float = 0.2
+    retrieval_budget_fraction: float = 0.5
+    critique_budget_fraction: float = 0.5
+    # Threads reserved for web searches, separate from the pool used for KB retrieval
+    web_search_max_workers: int = 8
+
+    # --- Answer Generation ---
+    # In 'auto' mode, contexts up to this many characters are answered in a single
+    # LLM call (fast mode); larger or noisier contexts go through critique -> writer.
+    # The default is an uncalibrated guess: recalibrate it from the "by context size"
+    # table of testing/benchmark_answer_paths.py.
+    fast_mode_max_context_chars: int = 8000
+
+    # --- Follow-up Context Reuse ---
+    # Cosine similarity between a turn's rag_query embedding and the cached anchor turn's:
+    # at or above the reuse threshold retrieval is skipped entirely; at or above the
+    # delta threshold only new KB chunks are fetched and the rest is reused. Either way the
+    # web search is re-run unless the planner's search_query is unchanged.
+    # Both defaults are uncalibrated guesses: tune them on a labelled set of
+    # follow-up / non-follow-up question pairs.
+    followup_reuse_threshold: float = 0.9
+    followup_delta_threshold: float = 0.8
+    # Share of the retrieval budget the follow-up embedding may use before falling back to fresh retrieval
+    followup_embedding_budget_fraction: float = 0.2
+    # Cap on KB chunks carried forward when follow-ups keep adding delta chunks
+    followup_max_reused_chunks: int = 6
+    context_cache_max_conversations: int = 1000
+    # Cached context older than this is dropped so stale web results are not reused
+    context_cache_ttl_seconds: float = 900.0
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, TypedDict
+import math
+import time
+
+from .config import settings
+
+
+class TurnContext(TypedDict):
+    """
+    Context cached for a conversation. The embedding is the anchor: that of the rag_query
+    of the turn that fetched the summary. Delta turns update kb_texts, and the web results
+    when the search_query changed.
+    """
+    embedding: List[float]
+    kb_texts: List[str]
+    summary: str
+    search_query: str  # Normalized planner search_query the web results were fetched for
+    search_results: str
+    retrieval_seconds: float  # Time the full retrieval took; what a reusing turn saves
+    fetched_at: float  # time.monotonic() when the summary and web results were fetched
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().strip(" ?!.").split())
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ConversationContextCache:
+    """
+    In-process LRU cache of each conversation's latest retrieved context, used to
+    answer follow-up questions without re-running retrieval and web search.
+    Entries expire `ttl_seconds` after their web results were fetched, so stale
+    results are never served as current.
+    """
+    def __init__(self, max_conversations: int, ttl_seconds: float):
+        self._lock = Lock()
+        self._max_conversations = max_conversations
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, TurnContext]" = OrderedDict()
+
+    def get(self, conversation_id: str) -> Optional[TurnContext]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["fetched_at"] > self._ttl_seconds:
+                del self._entries[conversation_id]
+                return None
+            self._entries.move_to_end(conversation_id)
+            return entry
+
+    def put(self, conversation_id: str, entry: TurnContext):
+        with self._lock:
+            self._entries[conversation_id] = entry
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self._max_conversations:
+                self._entries.popitem(last=False)
+
+
+# Create a single instance to be used by the application
+context_cache = ConversationContextCache(
+    settings.context_cache_max_conversations,
+    settings.context_cache_ttl_seconds,
+)
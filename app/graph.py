@@ -2,13 +2,17 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, END
+from typing import Any, List, Optional
 import asyncio
 import os
+import time
 
 from .schemas import GraphState
 from core.retriever import knowledge_base
-from core.tools import web_search_tool
+from core.tools import web_search_tool, web_search_executor
 from .config import settings
+from .metrics import metrics
+from .context_cache import context_cache, cosine_similarity, normalize_query
 
 os.environ["GOOGLE_API_KEY"] = settings.google_api_key
 # Initialize the Gemini LLM for the graph nodes
@@ -18,6 +22,57 @@ llm = ChatGoogleGenerativeAI(
     api_key=settings.google_api_key
 )
 
+# --- DEADLINE HELPERS ---
+
+# Human-readable names for the stages that can miss their budget
+STAGE_LABELS = {
+    "planner": "query planning",
+    "kb_retrieval": "knowledge base retrieval",
+    "summary": "knowledge base summary",
+    "web_search": "web search",
+    "critique": "context filtering",
+    "writer": "answer generation",
+}
+
+# Shown instead of an answer when the writer itself runs out of time
+WRITER_TIMEOUT_ANSWER = "I'm sorry, I ran out of time before I could finish writing an answer."
+
+def get_deadline(deadline_seconds: Optional[float] = None) -> float:
+    """
+    Returns the absolute time.monotonic() deadline for a request starting now.
+    """
+    return time.monotonic() + (deadline_seconds or settings.request_deadline_seconds)
+
+def _remaining_budget(state: GraphState) -> float:
+    deadline = state.get("deadline") or get_deadline()
+    return max(0.0, deadline - time.monotonic())
+
+async def _run_with_budget(awaitable, budget: float, stage: str, fallback: Any, timed_out_stages: List[str]) -> Any:
+    """
+    Awaits `awaitable` for at most `budget` seconds. On timeout the stage is cancelled,
+    recorded in `timed_out_stages` and the metrics, and `fallback` is returned instead.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=budget)
+    except asyncio.TimeoutError:
+        print(f"---{stage.upper()} TIMED OUT AFTER {budget:.1f}s---")
+        timed_out_stages.append(stage)
+        metrics.record_timeout(stage)
+        return fallback
+
+def _degraded_note(timed_out_stages: List[str]) -> str:
+    stages = ", ".join(STAGE_LABELS.get(stage, stage) for stage in timed_out_stages)
+    return f"\n\n_Note: this answer may be incomplete because the following step(s) ran out of time: {stages}._"
+
+def _answer_suffix(state: GraphState) -> str:
+    """
+    Returns the degraded-answer note to append to the final answer, or "" if every stage finished in time.
+    """
+    if not state.get("timed_out_stages"):
+        return ""
+    metrics.increment("degraded_answers")
+    return _degraded_note(state["timed_out_stages"])
+
 # --- NODE DEFINITIONS ---
 
 class Plan(BaseModel):
@@ -25,7 +80,7 @@ class Plan(BaseModel):
     search_query: str = Field(description="A concise query for a web search engine.")
     is_out_of_scope: bool = Field(description="True if the query is NOT related to space, astronomy, or astrophysics.")
 
-def plan_node(state: GraphState):
+async def plan_node(state: GraphState):
     print("---PLANNING---")
     prompt = ChatPromptTemplate.from_template(
         """You are a query understanding engine. Analyze the user's query and chat history.
@@ -37,23 +92,151 @@ def plan_node(state: GraphState):
          User Query: {query}"""
     )
     chain = prompt | llm.with_structured_output(Plan)
-    result = chain.invoke({"chat_history": state["chat_history"], "query": state["original_query"]})
-    return {"rag_query": result.rag_query, "search_query": result.search_query, "is_out_of_scope": result.is_out_of_scope}
+    # Start the clock here if the caller did not set a deadline
+    deadline = state.get("deadline") or get_deadline()
+    timed_out_stages = list(state.get("timed_out_stages") or [])
+    # Without a plan, fall back to searching for the raw query
+    fallback = Plan(rag_query=state["original_query"], search_query=state["original_query"], is_out_of_scope=False)
+    result = await _run_with_budget(
+        chain.ainvoke({"chat_history": state["chat_history"], "query": state["original_query"]}),
+        max(0.0, deadline - time.monotonic()) * settings.planner_budget_fraction,
+        "planner", fallback, timed_out_stages,
+    )
+    return {
+        "rag_query": result.rag_query,
+        "search_query": result.search_query,
+        "is_out_of_scope": result.is_out_of_scope,
+        "deadline": deadline,
+        "timed_out_stages": timed_out_stages,
+    }
+
+def _web_search(query: str):
+    return asyncio.get_running_loop().run_in_executor(web_search_executor, web_search_tool.run, query)
+
+async def _embed_and_retrieve(query: str, embedding: Optional[List[float]] = None):
+    """
+    Embeds the query (unless already embedded) and retrieves KB chunks with that embedding,
+    so the embedding can be cached for follow-up detection without a second round-trip.
+    """
+    if embedding is None:
+        embedding = await knowledge_base.embed_query(query)
+    return embedding, await knowledge_base.retrieve_texts(query, embedding)
+
+def _kb_context(kb_texts: Optional[List[str]], summary: str) -> str:
+    if kb_texts is None:
+        kb_docs = "(Knowledge base retrieval timed out)"
+    else:
+        kb_docs = knowledge_base.format_chunks(kb_texts)
+    return kb_docs + "\n\n" + summary if summary else kb_docs
 
 async def retrieve_and_search_node(state: GraphState):
     print("---RETRIEVING & SEARCHING (PARALLEL)---")
+    started = time.monotonic()
     rag_query = state["rag_query"]
     search_query = state["search_query"]
+    timed_out_stages = list(state.get("timed_out_stages") or [])
+    conversation_id = state.get("conversation_id")
+    previous = context_cache.get(conversation_id) if conversation_id else None
 
-    # Run knowledge base retrieval and web search concurrently
-    results = await asyncio.gather(
-        knowledge_base.retrieve(rag_query),
-        asyncio.to_thread(web_search_tool.run, search_query)
-    )
-    return {"retrieved_docs": results[0], "search_results": results[1]}
+    # Leave the rest of the deadline for the critique and writer nodes
+    budget = _remaining_budget(state) * settings.retrieval_budget_fraction
+
+    # Embed the rag_query up front only when there is a previous turn to compare against;
+    # the embedding is then reused by the vector search. If it is slow, give up on reuse and
+    # retrieve fresh with the rest of the budget. That does not degrade the answer, so it is
+    # counted separately from stage_timeouts.
+    embedding = None
+    if previous:
+        try:
+            embedding = await asyncio.wait_for(knowledge_base.embed_query(rag_query),
+                                               timeout=budget * settings.followup_embedding_budget_fraction)
+        except asyncio.TimeoutError:
+            print("---FOLLOW-UP EMBEDDING TIMED OUT, RETRIEVING FRESH---")
+            metrics.increment("followup_embedding_timeouts")
+        budget = max(0.0, budget - (time.monotonic() - started))
+    similarity = cosine_similarity(embedding, previous["embedding"]) if previous and embedding else 0.0
+    # Similar rag_queries can still target different things ("How big is Jupiter?" vs. Saturn),
+    # so cached web results are only reused for the same web search
+    same_search = previous is not None and normalize_query(search_query) == previous["search_query"]
+    metrics.increment("context_turns")
+
+    if similarity >= settings.followup_reuse_threshold and same_search:
+        # Follow-up on the same material: serve the previous turn's context as is
+        print(f"---REUSING PREVIOUS CONTEXT (SIMILARITY {similarity:.2f})---")
+        metrics.increment("context_reused")
+        metrics.increment("context_latency_saved_seconds",
+                          max(0.0, previous["retrieval_seconds"] - (time.monotonic() - started)))
+        return {
+            "retrieved_docs": _kb_context(previous["kb_texts"], previous["summary"]),
+            "search_results": previous["search_results"],
+            "timed_out_stages": timed_out_stages,
+        }
+
+    if similarity >= settings.followup_delta_threshold:
+        # Close follow-up: only fetch new KB chunks, reuse the summary, and reuse the web
+        # results only if the web search is unchanged
+        print(f"---FETCHING DELTA FOR FOLLOW-UP (SIMILARITY {similarity:.2f})---")
+        metrics.increment("context_delta")
+        kb_delta = _run_with_budget(knowledge_base.retrieve_texts(rag_query, embedding), budget,
+                                    "kb_retrieval", [], timed_out_stages)
+        if same_search:
+            new_texts = await kb_delta
+            search_results = previous["search_results"]
+        else:
+            new_texts, search_results = await asyncio.gather(
+                kb_delta,
+                _run_with_budget(_web_search(search_query), budget, "web_search",
+                                 "(Web search timed out)", timed_out_stages),
+            )
+        kb_texts = previous["kb_texts"] + [text for text in new_texts if text not in previous["kb_texts"]]
+        kb_texts = kb_texts[-settings.followup_max_reused_chunks:]
+        summary = previous["summary"]
+        metrics.increment("context_latency_saved_seconds",
+                          max(0.0, previous["retrieval_seconds"] - (time.monotonic() - started)))
+        # The anchor embedding stays that of the turn that fetched the summary, so chained
+        # follow-ups cannot drift away from it; fetched_at is kept too, so the entry still
+        # expires with its oldest content.
+        entry = {
+            **previous,
+            "kb_texts": kb_texts,
+            "search_query": normalize_query(search_query),
+            "search_results": search_results,
+        }
+    else:
+        metrics.increment("context_fresh")
+        # Run knowledge base retrieval, summary and web search concurrently, each within the budget.
+        # A timed-out web search thread cannot be interrupted; we just stop waiting for it,
+        # and it keeps running on its own executor without blocking KB retrieval.
+        (embedding, kb_texts), summary, search_results = await asyncio.gather(
+            _run_with_budget(_embed_and_retrieve(rag_query, embedding), budget, "kb_retrieval",
+                             (None, None), timed_out_stages),
+            _run_with_budget(knowledge_base.summarize(rag_query), budget, "summary", "", timed_out_stages),
+            _run_with_budget(_web_search(search_query), budget, "web_search",
+                             "(Web search timed out)", timed_out_stages),
+        )
+        entry = {
+            "embedding": embedding,
+            "kb_texts": kb_texts,
+            "summary": summary,
+            "search_query": normalize_query(search_query),
+            "search_results": search_results,
+            "retrieval_seconds": time.monotonic() - started,
+            "fetched_at": time.monotonic(),
+        }
+
+    # Only cache complete context so later follow-ups are not served partial results
+    if conversation_id and embedding and len(timed_out_stages) == len(state.get("timed_out_stages") or []):
+        context_cache.put(conversation_id, entry)
 
-def critique_node(state: GraphState):
+    return {
+        "retrieved_docs": _kb_context(kb_texts, summary),
+        "search_results": search_results,
+        "timed_out_stages": timed_out_stages,
+    }
+
+async def critique_node(state: GraphState):
     print("---CRITIQUING & FILTERING---")
+    timed_out_stages = list(state.get("timed_out_stages") or [])
     prompt = ChatPromptTemplate.from_template(
         """You are a relevance analysis agent. Examine the retrieved documents and web search results against the original user query.
          Filter out any information that is not directly relevant.
@@ -64,14 +247,33 @@ def critique_node(state: GraphState):
          Web Search Results: {search_results}"""
     )
     chain = prompt | llm
-    result = chain.invoke({
-        "original_query": state["original_query"],
-        "retrieved_docs": state["retrieved_docs"],
-        "search_results": state["search_results"],
-    })
-    return {"filtered_context": result.content}
+    result = await _run_with_budget(
+        chain.ainvoke({
+            "original_query": state["original_query"],
+            "retrieved_docs": state["retrieved_docs"],
+            "search_results": state["search_results"],
+        }),
+        _remaining_budget(state) * settings.critique_budget_fraction,
+        "critique", None, timed_out_stages,
+    )
+    if result is None:
+        # Out of time: let the writer work from the unfiltered context
+        filtered_context = f"{state['retrieved_docs']}\n\n{state['search_results']}"
+    else:
+        filtered_context = result.content
+    return {"filtered_context": filtered_context, "timed_out_stages": timed_out_stages}
+
+async def _answer_within_deadline(state: GraphState, awaitable) -> dict:
+    """
+    Runs the final answer call with whatever is left of the deadline and appends the degraded note.
+    """
+    timed_out_stages = list(state.get("timed_out_stages") or [])
+    result = await _run_with_budget(awaitable, _remaining_budget(state), "writer", None, timed_out_stages)
+    answer = WRITER_TIMEOUT_ANSWER if result is None else result.content
+    state = {**state, "timed_out_stages": timed_out_stages}
+    return {"final_answer": answer + _answer_suffix(state), "timed_out_stages": timed_out_stages}
 
-def writer_node(state: GraphState):
+async def writer_node(state: GraphState):
     print("---WRITING FINAL ANSWER---")
     prompt = ChatPromptTemplate.from_template(
         """You are a final answer synthesizer. Craft a comprehensive, well-structured answer using the provided 'Filtered Context'.
@@ -81,8 +283,77 @@ def writer_node(state: GraphState):
          Filtered Context: {filtered_context}"""
     )
     chain = prompt | llm
-    result = chain.invoke({"original_query": state["original_query"], "filtered_context": state["filtered_context"]})
-    return {"final_answer": result.content}
+    return await _answer_within_deadline(
+        state, chain.ainvoke({"original_query": state["original_query"], "filtered_context": state["filtered_context"]})
+    )
+
+# Fast mode: filter the context and write the answer in a single LLM call
+fast_answer_prompt = ChatPromptTemplate.from_template(
+    """You are a space research assistant. Examine the retrieved documents and web search results against the user's query,
+     ignore any information that is not directly relevant, and use the rest to craft a comprehensive, well-structured answer.
+     If nothing relevant was found, inform the user you couldn't find relevant information.
+
+     User's Original Query: {original_query}
+     Knowledge Base Docs: {retrieved_docs}
+     Web Search Results: {search_results}"""
+)
+
+def _fast_answer_inputs(state: GraphState) -> dict:
+    return {
+        "original_query": state["original_query"],
+        "retrieved_docs": state["retrieved_docs"],
+        "search_results": state["search_results"],
+    }
+
+async def fast_answer_node(state: GraphState):
+    print("---WRITING FINAL ANSWER (FAST MODE)---")
+    chain = fast_answer_prompt | llm
+    return await _answer_within_deadline(state, chain.ainvoke(_fast_answer_inputs(state)))
+
+async def stream_fast_answer(state: GraphState, timed_out_stages: List[str]):
+    """
+    Streaming variant of fast_answer_node: yields the answer in chunks as Gemini produces them.
+    The concatenated chunks equal the node's final_answer. Each chunk is awaited with whatever
+    is left of the deadline; on timeout the stream stops and "writer" is appended to
+    `timed_out_stages`, which the caller merges back into its state.
+    """
+    print("---STREAMING FINAL ANSWER (FAST MODE)---")
+    chain = fast_answer_prompt | llm
+    stream = chain.astream(_fast_answer_inputs(state))
+    timed_out = object()
+    streamed_any = False
+    try:
+        while True:
+            chunk = await _run_with_budget(anext(stream, None), _remaining_budget(state), "writer",
+                                           timed_out, timed_out_stages)
+            if chunk is None:
+                break
+            if chunk is timed_out:
+                if not streamed_any:
+                    yield WRITER_TIMEOUT_ANSWER
+                break
+            if chunk.content:
+                streamed_any = True
+                yield chunk.content
+    finally:
+        await stream.aclose()
+    suffix = _answer_suffix({**state, "timed_out_stages": timed_out_stages})
+    if suffix:
+        yield suffix
+
+def select_answer_path(state: GraphState) -> str:
+    """
+    Chooses between the single-call fast path and the two-stage critique -> writer path.
+    In 'auto' mode the fast path is used when the retrieved context is small enough
+    that a separate filtering pass is not worth a second round-trip.
+    """
+    mode = state.get("mode") or "auto"
+    if mode == "auto":
+        context_chars = len(state["retrieved_docs"]) + len(state["search_results"])
+        mode = "fast" if context_chars <= settings.fast_mode_max_context_chars else "full"
+    path = "fast_answer" if mode == "fast" else "critique"
+    metrics.increment(f"answer_path_{path}")
+    return path
 
 def out_of_scope_node(state: GraphState):
     print("---HANDLING OUT OF SCOPE---")
@@ -97,6 +368,7 @@ def create_graph():
     workflow.add_node("retrieve_and_search", retrieve_and_search_node)
     workflow.add_node("critique", critique_node)
     workflow.add_node("writer", writer_node)
+    workflow.add_node("fast_answer", fast_answer_node)
     workflow.add_node("out_of_scope", out_of_scope_node)
     
     workflow.set_entry_point("planner")
@@ -118,9 +390,17 @@ def create_graph():
             "out_of_scope": "out_of_scope"
         }
     )
-    workflow.add_edge("retrieve_and_search", "critique")
+    workflow.add_conditional_edges(
+        "retrieve_and_search",
+        select_answer_path,
+        {
+            "fast_answer": "fast_answer",
+            "critique": "critique"
+        }
+    )
     workflow.add_edge("critique", "writer")
     workflow.add_edge("writer", END)
+    workflow.add_edge("fast_answer", END)
     workflow.add_edge("out_of_scope", END)
     
     return workflow.compile()
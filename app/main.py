@@ -8,8 +8,9 @@ import uuid
 import os
 
 from .schemas import ChatRequest
-from .graph import graph_app
+from .graph import graph_app, get_deadline
 from .config import settings
+from .metrics import metrics
 
 # Initialize FastAPI app
 api = FastAPI(
@@ -53,13 +54,20 @@ async def execute_graph_with_steps(inputs, session_id):
         "search_results": "",
         "filtered_context": "",
         "final_answer": "",
+        "deadline": inputs["deadline"],
+        "timed_out_stages": [],
+        "mode": inputs["mode"],
+        "conversation_id": inputs["conversation_id"],
     }
     
     # Import here to avoid circular imports
-    from .graph import plan_node, retrieve_and_search_node, critique_node, writer_node, out_of_scope_node
+    from .graph import (
+        plan_node, retrieve_and_search_node, critique_node, writer_node, out_of_scope_node,
+        select_answer_path, stream_fast_answer,
+    )
     
     # Execute planning
-    plan_result = plan_node(planning_state)
+    plan_result = await plan_node(planning_state)
     planning_state.update(plan_result)
     
     # Check if out of scope
@@ -67,7 +75,13 @@ async def execute_graph_with_steps(inputs, session_id):
         yield {"type": "step", "step": "Handling out-of-scope query...", "session_id": session_id}
         final_result = out_of_scope_node(planning_state)
         planning_state.update(final_result)
-        yield {"type": "answer", "answer": planning_state["final_answer"], "session_id": session_id}
+        yield {
+            "type": "answer",
+            "answer": planning_state["final_answer"],
+            "degraded": bool(planning_state["timed_out_stages"]),
+            "timed_out_stages": planning_state["timed_out_stages"],
+            "session_id": session_id,
+        }
         return
     
     # Step 2: Retrieval and Search
@@ -75,18 +89,34 @@ async def execute_graph_with_steps(inputs, session_id):
     retrieve_result = await retrieve_and_search_node(planning_state)
     planning_state.update(retrieve_result)
     
-    # Step 3: Critique and Filter
-    yield {"type": "step", "step": "Filtering and analyzing context...", "session_id": session_id}
-    critique_result = critique_node(planning_state)
-    planning_state.update(critique_result)
-    
-    # Step 4: Generate Final Answer
-    yield {"type": "step", "step": "Generating final response...", "session_id": session_id}
-    writer_result = writer_node(planning_state)
-    planning_state.update(writer_result)
+    if select_answer_path(planning_state) == "fast_answer":
+        # Step 3 (fast mode): Filter and answer in one call, streaming tokens as they arrive
+        yield {"type": "step", "step": "Generating response...", "session_id": session_id}
+        chunks = []
+        timed_out_stages = list(planning_state["timed_out_stages"])
+        async for chunk in stream_fast_answer(planning_state, timed_out_stages):
+            chunks.append(chunk)
+            yield {"type": "token", "token": chunk, "session_id": session_id}
+        planning_state.update({"final_answer": "".join(chunks), "timed_out_stages": timed_out_stages})
+    else:
+        # Step 3: Critique and Filter
+        yield {"type": "step", "step": "Filtering and analyzing context...", "session_id": session_id}
+        critique_result = await critique_node(planning_state)
+        planning_state.update(critique_result)
+        
+        # Step 4: Generate Final Answer
+        yield {"type": "step", "step": "Generating final response...", "session_id": session_id}
+        writer_result = await writer_node(planning_state)
+        planning_state.update(writer_result)
     
     # Send final answer
-    yield {"type": "answer", "answer": planning_state["final_answer"], "session_id": session_id}
+    yield {
+        "type": "answer",
+        "answer": planning_state["final_answer"],
+        "degraded": bool(planning_state["timed_out_stages"]),
+        "timed_out_stages": planning_state["timed_out_stages"],
+        "session_id": session_id,
+    }
 
 @api.post("/chat-stream")
 async def chat_stream_endpoint(request: ChatRequest):
@@ -108,6 +138,9 @@ async def chat_stream_endpoint(request: ChatRequest):
             inputs = {
                 "original_query": request.query,
                 "chat_history": chat_history,
+                "deadline": get_deadline(request.deadline_seconds),
+                "mode": request.mode,
+                "conversation_id": request.conversation_id,
             }
             
             # Send initial step
@@ -150,12 +183,27 @@ async def chat_endpoint(request: ChatRequest):
     inputs = {
         "original_query": request.query,
         "chat_history": chat_history,
+        "deadline": get_deadline(request.deadline_seconds),
+        "mode": request.mode,
+        "conversation_id": request.conversation_id,
     }
     
     # Asynchronously invoke the LangGraph agent
     final_state = await graph_app.ainvoke(inputs)
     
-    return {"answer": final_state.get("final_answer", "Sorry, something went wrong.")}
+    timed_out_stages = final_state.get("timed_out_stages") or []
+    return {
+        "answer": final_state.get("final_answer", "Sorry, something went wrong."),
+        "degraded": bool(timed_out_stages),
+        "timed_out_stages": timed_out_stages,
+    }
+
+@api.get("/metrics")
+def metrics_endpoint():
+    """
+    Returns in-process pipeline counters, including which stages missed their deadline.
+    """
+    return metrics.snapshot()
 
 @api.get("/")
 def read_root():
@@ -0,0 +1,41 @@
+from collections import Counter
+from threading import Lock
+
+
+class Metrics:
+    """
+    Lightweight in-process counters for the chat pipeline.
+    Exposed as JSON through the /metrics endpoint.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = Counter()
+        self._stage_timeouts = Counter()
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_timeout(self, stage: str):
+        with self._lock:
+            self._stage_timeouts[stage] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            turns = self._counters["context_turns"]
+            reused = self._counters["context_reused"]
+            delta = self._counters["context_delta"]
+            return {
+                "counters": dict(self._counters),
+                "stage_timeouts": dict(self._stage_timeouts),
+                "context_reuse": {
+                    "turns": turns,
+                    "reused_fraction": reused / turns if turns else 0.0,
+                    "delta_fraction": delta / turns if turns else 0.0,
+                    "latency_saved_seconds": round(self._counters["context_latency_saved_seconds"], 3),
+                },
+            }
+
+
+# Create a single instance to be used by the application
+metrics = Metrics()
@@ -1,4 +1,4 @@
-from typing import List, TypedDict
+from typing import List, Literal, Optional, TypedDict
 from langchain_core.messages import BaseMessage
 from pydantic import BaseModel, Field
 
@@ -9,6 +9,19 @@ class ChatRequest(BaseModel):
         default_factory=list, 
         description="A list of previous messages, e.g., [{'role': 'user', 'content': 'Hi'}, {'role': 'assistant', 'content': 'Hello'}]"
     )
+    deadline_seconds: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="End-to-end latency budget for this request in seconds. Defaults to the server's REQUEST_DEADLINE_SECONDS."
+    )
+    mode: Literal["auto", "fast", "full"] = Field(
+        default="auto",
+        description="'fast' filters and answers in one LLM call, 'full' uses critique -> writer, 'auto' picks by context size."
+    )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        description="Stable ID of the conversation; lets follow-up questions reuse the previous turn's retrieved context."
+    )
 
 # --- Graph State Schema ---
 class GraphState(TypedDict):
@@ -24,4 +37,8 @@ class GraphState(TypedDict):
     search_results: str
     filtered_context: str
     final_answer: str
+    deadline: float  # Absolute time.monotonic() by which the answer must be produced
+    timed_out_stages: List[str]  # Stages that missed their budget; a non-empty list means the answer is degraded
+    mode: str  # "auto", "fast" or "full"; see ChatRequest.mode
+    conversation_id: str  # Optional key for reusing retrieved context across turns
     _session_id: str  # Optional session ID for step tracking
\ No newline at end of file
@@ -1,6 +1,7 @@
+import asyncio
 import os
-from typing import List, Dict, Any, Tuple
-from llama_index.core import Settings, VectorStoreIndex, StorageContext, load_index_from_storage, SummaryIndex
+from typing import List, Dict, Any, Optional, Tuple
+from llama_index.core import QueryBundle, Settings, VectorStoreIndex, StorageContext, load_index_from_storage, SummaryIndex
 from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
 from llama_index.llms.google_genai import GoogleGenAI
 from llama_index.vector_stores.qdrant import QdrantVectorStore
@@ -48,26 +49,44 @@ class KnowledgeBase:
             response_mode="tree_summarize", use_async=True
         )
 
-    async def retrieve(self, query: str) -> str:
-        # Retrieve nodes from the vector store
-        nodes = self._kb_retriever.retrieve(query)
-        
-        # Format the retrieved chunks
+    async def embed_query(self, query: str) -> List[float]:
+        return await Settings.embed_model.aget_query_embedding(query)
+
+    async def retrieve_texts(self, query: str, embedding: Optional[List[float]] = None) -> List[str]:
+        # Reuse a precomputed query embedding when available to skip a second embedding call
+        query_bundle = QueryBundle(query_str=query, embedding=embedding)
+        # Retrieve nodes from the vector store (off the event loop so it can be timed out)
+        nodes = await asyncio.to_thread(self._kb_retriever.retrieve, query_bundle)
+        return [n.get_text() for n in nodes]
+
+    @staticmethod
+    def format_chunks(texts: List[str]) -> str:
         chunks = []
-        for i, n in enumerate(nodes, start=1):
-            chunks.append(f"[KB:{i}] {n.get_text()}")
+        for i, text in enumerate(texts, start=1):
+            chunks.append(f"[KB:{i}] {text}")
         
-        kb_context_text = "\n\n".join(chunks) if chunks else "(No relevant information found in the knowledge base)"
+        return "\n\n".join(chunks) if chunks else "(No relevant information found in the knowledge base)"
 
-        # Asynchronously get the summary abstract
+    async def retrieve_chunks(self, query: str) -> str:
+        return self.format_chunks(await self.retrieve_texts(query))
+
+    async def summarize(self, query: str) -> str:
+        # Asynchronously get the summary abstract; empty string if unavailable
         try:
             summary_resp = await self._summary_engine.aquery(query)
             if summary_resp and str(summary_resp).strip():
-                kb_context_text += "\n\n" + f"[KB:abstract] {summary_resp}"
+                return f"[KB:abstract] {summary_resp}"
         except Exception as e:
             print(f"Error during summary query: {e}")
-            pass
+        return ""
 
+    async def retrieve(self, query: str) -> str:
+        kb_context_text, summary = await asyncio.gather(
+            self.retrieve_chunks(query),
+            self.summarize(query),
+        )
+        if summary:
+            kb_context_text += "\n\n" + summary
         return kb_context_text
 
 # Create a single instance to be used by the application
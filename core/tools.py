@@ -4,6 +4,7 @@ import sys
 import os
 import trafilatura
 import json
+from concurrent.futures import ThreadPoolExecutor
 # Add the parent directory to the path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.config import settings
@@ -106,4 +107,12 @@ def get_web_search_tool():
     
     return tool
 
-web_search_tool = get_web_search_tool()
\ No newline at end of file
+web_search_tool = get_web_search_tool()
+
+# Web searches run on their own bounded pool: a timed-out search thread cannot be
+# interrupted, and hung Serper/scraping calls must not starve the default pool
+# that knowledge base retrieval runs on.
+web_search_executor = ThreadPoolExecutor(
+    max_workers=settings.web_search_max_workers,
+    thread_name_prefix="web-search",
+)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import pandas as pd
+
+# Add the project root to the Python path
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from app.config import settings
+from app.graph import (
+    plan_node,
+    retrieve_and_search_node,
+    critique_node,
+    writer_node,
+    fast_answer_node,
+    get_deadline,
+)
+
+
+def _total_tokens(usage_metadata: dict) -> dict:
+    """
+    Sums the per-model usage reported by the callback into input/output/total token counts.
+    """
+    totals = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    for usage in usage_metadata.values():
+        for key in totals:
+            totals[key] += usage.get(key, 0)
+    return totals
+
+
+async def run_full_path(state: dict):
+    """
+    Two-stage path: critique -> writer. Returns (latency in seconds, token usage).
+    """
+    with get_usage_metadata_callback() as cb:
+        start = time.perf_counter()
+        state = {**state, **await critique_node(state)}
+        await writer_node(state)
+        latency = time.perf_counter() - start
+    return latency, _total_tokens(cb.usage_metadata)
+
+
+async def run_fast_path(state: dict):
+    """
+    Single-call fast path. Returns (latency in seconds, token usage).
+    """
+    with get_usage_metadata_callback() as cb:
+        start = time.perf_counter()
+        await fast_answer_node(state)
+        latency = time.perf_counter() - start
+    return latency, _total_tokens(cb.usage_metadata)
+
+
+async def main(limit: int = None):
+    """
+    Benchmarks answer generation latency and token cost of the fast and full paths.
+    Planning and retrieval run once per question so both paths see the same context.
+    """
+    print("Starting answer path benchmark...")
+
+    # 1. Load questions from the JSONL file
+    questions_file = os.path.join(os.path.dirname(__file__), "space_article_questions.jsonl")
+    with open(questions_file, "r", encoding="utf-8") as f:
+        data = [json.loads(line) for line in f]
+    if limit:
+        data = data[:limit]
+
+    rows = []
+    for index, item in enumerate(data):
+        question = item["question"]
+        print(f"\nQuestion {item['id']}: {question}")
+
+        # 2. Plan and retrieve once; a generous deadline keeps timeouts out of the measurement
+        state = {
+            "original_query": question,
+            "chat_history": [],
+            "deadline": get_deadline(3600),
+            "timed_out_stages": [],
+        }
+        state.update(await plan_node(state))
+        if state["is_out_of_scope"]:
+            print("Skipping: planner marked the question out of scope.")
+            continue
+        state.update(await retrieve_and_search_node(state))
+        context_chars = len(state["retrieved_docs"]) + len(state["search_results"])
+
+        # 3. Time both generation paths on the same context, alternating which runs first
+        #    so warm-up and caching effects do not favour one path
+        if index % 2 == 0:
+            first_path = "full"
+            full_latency, full_tokens = await run_full_path(state)
+            fast_latency, fast_tokens = await run_fast_path(state)
+        else:
+            first_path = "fast"
+            fast_latency, fast_tokens = await run_fast_path(state)
+            full_latency, full_tokens = await run_full_path(state)
+
+        rows.append({
+            "id": item["id"],
+            "context_chars": context_chars,
+            "auto_path": "fast" if context_chars <= settings.fast_mode_max_context_chars else "full",
+            "first_path": first_path,
+            "full_latency_s": round(full_latency, 2),
+            "fast_latency_s": round(fast_latency, 2),
+            "full_tokens": full_tokens["total_tokens"],
+            "fast_tokens": fast_tokens["total_tokens"],
+            "full_input_tokens": full_tokens["input_tokens"],
+            "fast_input_tokens": fast_tokens["input_tokens"],
+        })
+
+    if not rows:
+        print("No in-scope questions were benchmarked.")
+        return
+
+    # 4. Print and save the results
+    df = pd.DataFrame(rows)
+    summary = df[["full_latency_s", "fast_latency_s", "full_tokens", "fast_tokens"]].agg(["mean", "median"])
+
+    # Latency saved by the fast path per context size quartile, for calibrating FAST_MODE_MAX_CONTEXT_CHARS
+    df["fast_saving_s"] = df["full_latency_s"] - df["fast_latency_s"]
+    by_size = df.groupby(pd.qcut(df["context_chars"], q=min(4, len(df)), duplicates="drop"), observed=True)[
+        ["fast_saving_s", "full_tokens", "fast_tokens"]
+    ].mean()
+
+    print("\nPer-question results:")
+    print(df)
+    print("\nSummary:")
+    print(summary)
+    print("\nBy context size (chars):")
+    print(by_size)
+
+    results_file = os.path.join(os.path.dirname(__file__), "answer_path_benchmark_results.txt")
+    with open(results_file, "w") as f:
+        f.write("Answer Path Benchmark Results (fast vs. critique -> writer)\n")
+        f.write("=" * 30 + "\n")
+        f.write(df.to_string())
+        f.write("\n\nSummary\n")
+        f.write("=" * 30 + "\n")
+        f.write(summary.to_string())
+        f.write("\n\nBy context size (chars)\n")
+        f.write("=" * 30 + "\n")
+        f.write(by_size.to_string())
+
+    print(f"\nResults saved to {results_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fast and full answer paths.")
+    parser.add_argument("--limit", type=int, default=None, help="Only benchmark the first N questions.")
+    args = parser.parse_args()
+    asyncio.run(main(args.limit))